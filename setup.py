@@ -103,7 +103,7 @@ extra_gemini_requires = ["google-generativeai>=0.4.0"]
 #  https://github.com/BerriAI/litellm/issues/10349
 extra_litellm_requires = ["litellm==1.65"]
 extra_zhipuai_requires = ["zhipuai"]
-extra_ollama_requires = ["ollama>=0.1.7"]
+extra_ollama_requires = ["ollama>=0.3.0", "aiohttp"]
 extra_anthropic_requires = ["anthropic"]
 
 # Full requires
@@ -0,0 +1,618 @@
+# -*- coding: utf-8 -*-
+"""The utilities for creating the clients of Ollama model wrappers."""
+import asyncio
+import copy
+import functools
+import importlib.util
+import json
+import os
+import ssl
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional, AsyncGenerator, Union, List, Callable
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ollama = None
+
+
+def _require_ollama() -> Any:
+    """Import the ollama package once and cache the module, which raises an
+    `ImportError` with the installation command if it is not installed."""
+    global _ollama
+    if _ollama is None:
+        try:
+            import ollama
+        except ImportError as e:
+            raise ImportError(
+                "The package ollama is not found. Please install it by "
+                'running command `pip install "ollama>=0.3.0"`',
+            ) from e
+        _ollama = ollama
+    return _ollama
+
+
+def _json_dumps(
+    obj: Any,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Serialize the object into a JSON string, by orjson if installed,
+    which is several times faster than the standard json module. A
+    `TypeError` is raised for the values that cannot be serialized, unless
+    `default` is given to convert them."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option, default=default).decode()
+    return json.dumps(obj, sort_keys=sort_keys, default=default)
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Deserialize the JSON string, by orjson if installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _prepare_httpx_kwargs(kwargs: dict) -> dict:
+    """Prepare the keyword arguments passed to the httpx client underlying
+    the ollama client. Unless specified by the user, the connections are
+    kept alive in a larger pool, and HTTP/2 is enabled when the `h2`
+    package is installed.
+
+    Args:
+        kwargs (`dict`):
+            The client arguments given by the user.
+
+    Returns:
+        `dict`:
+            The prepared client arguments.
+    """
+    import httpx
+
+    kwargs = dict(kwargs)
+
+    # The limits and http2 are passed to the client rather than a custom
+    # transport, so that httpx still builds the transport with the verify,
+    # cert and trust_env arguments and the proxy environment variables. They
+    # are ignored by httpx when the user gives a transport.
+    if "transport" not in kwargs:
+        kwargs.setdefault("http2", importlib.util.find_spec("h2") is not None)
+        kwargs.setdefault(
+            "limits",
+            httpx.Limits(
+                max_keepalive_connections=40,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+        )
+
+    # Keep no read timeout as ollama does, since the generation of long
+    # responses can take minutes, but fail fast on unreachable servers
+    kwargs.setdefault("timeout", httpx.Timeout(None, connect=10.0))
+
+    return kwargs
+
+
+@functools.lru_cache(maxsize=32)
+def _get_client(host: Optional[str], kwargs_items: tuple) -> Any:
+    """Get the ollama client for the given host and client arguments, which
+    is shared by all model wrappers targeting the same server, so that they
+    reuse one HTTP connection pool."""
+    return _require_ollama().Client(
+        host=host,
+        **_prepare_httpx_kwargs(dict(kwargs_items)),
+    )
+
+
+def _create_client(host: Optional[str], kwargs: dict) -> Any:
+    """Create the sync ollama client for the given host, which is shared
+    with other model wrappers if the client arguments are hashable."""
+    kwargs_items = tuple(sorted(kwargs.items()))
+    try:
+        hash(kwargs_items)
+    except TypeError:
+        # The client cannot be shared if the client arguments are not
+        # hashable, e.g. a dict of headers
+        return _require_ollama().Client(
+            host=host,
+            **_prepare_httpx_kwargs(kwargs),
+        )
+    return _get_client(host, kwargs_items)
+
+
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _create_async_client(host: Optional[str], kwargs: dict) -> Any:
+    """Create the async ollama client for the given host in the running
+    event loop, which is shared with other model wrappers in the same event
+    loop if the client arguments are hashable. Since the connection pool of
+    an async client is bound to the event loop where it is first used, the
+    clients are never shared across event loops, and they are released
+    together with their event loop."""
+    ollama = _require_ollama()
+    kwargs_items = tuple(sorted(kwargs.items()))
+    try:
+        hash(kwargs_items)
+    except TypeError:
+        return ollama.AsyncClient(
+            host=host,
+            **_prepare_httpx_kwargs(kwargs),
+        )
+
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if (host, kwargs_items) not in clients:
+            clients[(host, kwargs_items)] = ollama.AsyncClient(
+                host=host,
+                **_prepare_httpx_kwargs(kwargs),
+            )
+        return clients[(host, kwargs_items)]
+
+
+class _HostBalancer:
+    """A load balancer among multiple ollama servers, which routes each
+    request to the server with the least estimated request waiting time,
+    i.e. the number of in-flight requests multiplied by the mean latency.
+    Servers without any finished request are tried first, and servers
+    whose last requests failed are skipped for a backoff period."""
+
+    def __init__(
+        self,
+        hosts: List[Optional[str]],
+        smoothing: float = 0.2,
+        retry_after: float = 1.0,
+        max_retry_after: float = 30.0,
+    ) -> None:
+        """Initialize the load balancer.
+
+        Args:
+            hosts (`List[Optional[str]]`):
+                The host ports of the ollama servers.
+            smoothing (`float`, default `0.2`):
+                The smoothing factor of the exponential moving average of
+                the latency, where a larger one adapts faster.
+            retry_after (`float`, default `1.0`):
+                The seconds to skip a server after a failed request, which
+                is doubled for each consecutive failure.
+            max_retry_after (`float`, default `30.0`):
+                The maximum seconds to skip a failing server, after which
+                it is tried again.
+        """
+        self.hosts = hosts
+        self.smoothing = smoothing
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+
+        self._in_flight = [0] * len(hosts)
+        self._latency = [0.0] * len(hosts)
+        self._finished = [0] * len(hosts)
+        self._samples = [0] * len(hosts)
+        self._failed = [0] * len(hosts)
+        self._cancelled = [0] * len(hosts)
+        self._consecutive_failures = [0] * len(hosts)
+        self._retry_at = [0.0] * len(hosts)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> int:
+        """Pick the server for a new request and count it as in-flight.
+        If all servers are in their backoff periods, the one to be retried
+        first is picked.
+
+        Returns:
+            `int`:
+                The index of the picked server.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                i for i in range(len(self.hosts)) if self._retry_at[i] <= now
+            ] or [min(range(len(self.hosts)), key=self._retry_at.__getitem__)]
+            index = min(
+                candidates,
+                key=lambda i: (
+                    (self._in_flight[i] + 1) * self._latency[i],
+                    self._in_flight[i],
+                ),
+            )
+            self._in_flight[index] += 1
+            return index
+
+    def observe(self, index: int, latency: float) -> None:
+        """Update the mean latency of the server by a new sample.
+
+        Args:
+            index (`int`):
+                The index of the server returned by `acquire`.
+            latency (`float`):
+                The latency of the request in seconds.
+        """
+        with self._lock:
+            self._samples[index] += 1
+            if self._samples[index] == 1:
+                self._latency[index] = latency
+            else:
+                self._latency[index] += self.smoothing * (
+                    latency - self._latency[index]
+                )
+
+    def release(
+        self,
+        index: int,
+        latency: Optional[float],
+        failed: bool,
+    ) -> None:
+        """Finish a request on the server, and update its mean latency.
+
+        Args:
+            index (`int`):
+                The index of the server returned by `acquire`.
+            latency (`Optional[float]`):
+                The latency of the request in seconds, which is `None` if
+                it has been observed by `observe`, e.g. for streams.
+            failed (`bool`):
+                Whether the request failed, in which case the server is
+                skipped for a backoff period, which grows exponentially
+                with the consecutive failures up to `max_retry_after`.
+        """
+        with self._lock:
+            self._in_flight[index] -= 1
+            if failed:
+                self._failed[index] += 1
+                self._consecutive_failures[index] += 1
+                backoff = min(
+                    self.retry_after
+                    * 2 ** (self._consecutive_failures[index] - 1),
+                    self.max_retry_after,
+                )
+                self._retry_at[index] = time.monotonic() + backoff
+                return
+
+            self._finished[index] += 1
+            self._consecutive_failures[index] = 0
+            self._retry_at[index] = 0.0
+
+        if latency is not None:
+            self.observe(index, latency)
+
+    def cancel(self, index: int) -> None:
+        """Release a request which is cancelled or closed by the caller,
+        e.g. by a timeout, without observing its latency, since it says
+        nothing about the server.
+
+        Args:
+            index (`int`):
+                The index of the server returned by `acquire`.
+        """
+        with self._lock:
+            self._in_flight[index] -= 1
+            self._cancelled[index] += 1
+
+    @property
+    def stats(self) -> List[dict]:
+        """The statistics of each server, including the host, the number
+        of in-flight, finished, failed and cancelled requests, the mean
+        latency, and the seconds until it is tried again after failures."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "host": host,
+                    "in_flight": self._in_flight[i],
+                    "finished": self._finished[i],
+                    "failed": self._failed[i],
+                    "cancelled": self._cancelled[i],
+                    "mean_latency": self._latency[i],
+                    "retry_after": max(self._retry_at[i] - now, 0.0),
+                }
+                for i, host in enumerate(self.hosts)
+            ]
+
+
+def _convert_function_to_tool(func: Callable) -> Any:
+    """Convert a Python function into an ollama tool schema in the same way
+    as the ollama client. The converter is not a public API of ollama, so a
+    clear error is raised if it's not found in the installed version."""
+    try:
+        from ollama._utils import convert_function_to_tool
+    except ImportError as e:
+        raise ImportError(
+            "Python functions as tools are not supported by the aiohttp "
+            "backend with the installed ollama version. Please pass the "
+            "tools as JSON schemas, or set `use_aiohttp=False`.",
+        ) from e
+    return convert_function_to_tool(func)
+
+
+class _AiohttpBackend:
+    """A backend that posts requests to the ollama server directly with a
+    shared `aiohttp.ClientSession`, which is used by the async methods of
+    the ollama model wrappers in place of `ollama.AsyncClient`, since httpx
+    suffers from throughput collapse under high concurrency.
+
+    The responses are returned as dicts with the same fields as the ollama
+    client, and the errors are raised as `ollama.ResponseError`.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        headers: Optional[dict] = None,
+        verify: Union[bool, str, ssl.SSLContext] = True,
+    ) -> None:
+        """Initialize the aiohttp backend.
+
+        Args:
+            host (`str`, default `None`):
+                The host port of the ollama server. Defaults to `None`, which
+                is the `OLLAMA_HOST` environment variable or 127.0.0.1:11434.
+            headers (`dict`, default `None`):
+                The headers sent with each request, e.g. an Authorization
+                header for a proxied server.
+            verify (`Union[bool, str, ssl.SSLContext]`, default `True`):
+                Whether to verify the SSL certificate of the server, or the
+                path to a CA bundle, or an SSL context, as in httpx.
+        """
+        self.base_url = self._parse_host(host or os.getenv("OLLAMA_HOST"))
+        self.headers = dict(headers or {})
+        self.ssl = (
+            ssl.create_default_context(cafile=verify)
+            if isinstance(verify, str)
+            else verify
+        )
+
+        # The sessions by event loop
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    @staticmethod
+    def _parse_host(host: Optional[str]) -> str:
+        """Parse the host into a base url in the same way as the ollama
+        client, e.g. "1.2.3.4" into "http://1.2.3.4:11434"."""
+        host = host or ""
+        scheme, sep, _ = host.partition("://")
+        if sep:
+            default_port = {"http": 80, "https": 443}.get(scheme, 11434)
+        else:
+            scheme, default_port = "http", 11434
+            host = f"http://{host}"
+
+        split = urlsplit(host)
+        hostname = split.hostname or "127.0.0.1"
+        port = split.port or default_port
+        return f"{scheme}://{hostname}:{port}{split.path.rstrip('/')}"
+
+    def _pop_stale_sessions(self) -> list:
+        """Pop the sessions left open in the closed event loops, which
+        should be closed in the running event loop. Their connections are
+        only dropped by aiohttp, since their event loops are gone."""
+        return [
+            self._sessions.pop(loop)
+            for loop in list(self._sessions)
+            if loop.is_closed()
+        ]
+
+    async def _get_session(self) -> Any:
+        """Get the aiohttp session of the running event loop, which is
+        created lazily as it is bound to the event loop."""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is not None and not session.closed:
+                return session
+
+            stale_sessions = self._pop_stale_sessions()
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                json_serialize=_json_dumps,
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    keepalive_timeout=30,
+                    ssl=self.ssl,
+                ),
+            )
+            self._sessions[loop] = session
+
+        for stale_session in stale_sessions:
+            await stale_session.close()
+        return session
+
+    @staticmethod
+    async def _raise_for_status(resp: Any) -> None:
+        """Raise `ollama.ResponseError` if the request failed."""
+        if resp.status < 400:
+            return
+
+        text = await resp.text()
+        try:
+            error = _json_loads(text)["error"]
+        except (ValueError, KeyError, TypeError):
+            error = text
+        raise _require_ollama().ResponseError(error, resp.status)
+
+    @staticmethod
+    def _prepare_body(body: dict, stream: bool) -> dict:
+        """Prepare the request body in the same way as the ollama client,
+        i.e. omitting the `None` values, encoding the images given as file
+        paths or bytes in base64, and converting the Python functions in the
+        tools into tool schemas."""
+        ollama = _require_ollama()
+
+        def copy_images(images: list) -> list:
+            return [
+                _ if isinstance(_, ollama.Image) else ollama.Image(value=_)
+                for _ in images
+            ]
+
+        body = {k: v for k, v in body.items() if v is not None}
+        body["stream"] = stream
+
+        if body.get("messages"):
+            body["messages"] = [
+                ollama.Message.model_validate(
+                    {
+                        k: copy_images(v) if k == "images" else v
+                        for k, v in dict(message).items()
+                        if v
+                    },
+                ).model_dump(exclude_none=True)
+                for message in body["messages"]
+            ]
+
+        if body.get("images"):
+            body["images"] = [
+                _.model_dump() for _ in copy_images(body["images"])
+            ]
+
+        if body.get("tools"):
+            body["tools"] = [
+                (
+                    _convert_function_to_tool(_)
+                    if callable(_)
+                    else ollama.Tool.model_validate(_)
+                ).model_dump(exclude_none=True)
+                for _ in body["tools"]
+            ]
+
+        return body
+
+    async def request(self, path: str, body: dict) -> dict:
+        """Post a non-stream request to the given API path.
+
+        Args:
+            path (`str`):
+                The API path, e.g. "/api/chat".
+            body (`dict`):
+                The request body, which is prepared as the ollama client
+                does.
+
+        Returns:
+            `dict`:
+                The response returned by the ollama server.
+        """
+        body = self._prepare_body(body, stream=False)
+
+        session = await self._get_session()
+        # pylint: disable=E1701
+        async with session.post(self.base_url + path, json=body) as resp:
+            await self._raise_for_status(resp)
+            return await resp.json(loads=_json_loads, content_type=None)
+
+    async def stream(
+        self,
+        path: str,
+        body: dict,
+    ) -> AsyncGenerator[dict, None]:
+        """Post a stream request to the given API path, and yield the
+        chunks returned by the ollama server.
+
+        Args:
+            path (`str`):
+                The API path, e.g. "/api/chat".
+            body (`dict`):
+                The request body, which is prepared as the ollama client
+                does.
+
+        Yields:
+            `dict`:
+                The response chunks, one per line of the response body.
+        """
+        body = self._prepare_body(body, stream=True)
+
+        session = await self._get_session()
+        # pylint: disable=E1701
+        async with session.post(self.base_url + path, json=body) as resp:
+            await self._raise_for_status(resp)
+            async for line in resp.content:
+                if not line.strip():
+                    continue
+                chunk = _json_loads(line)
+                if "error" in chunk:
+                    raise _require_ollama().ResponseError(chunk["error"])
+                yield chunk
+
+    async def close(self) -> None:
+        """Close the aiohttp session of the running event loop, and the
+        sessions left open in the closed event loops."""
+        with self._sessions_lock:
+            sessions = self._pop_stale_sessions()
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            sessions.append(session)
+        for session in sessions:
+            await session.close()
+
+
+@functools.lru_cache(maxsize=32)
+def _get_aiohttp_backend(
+    host: Optional[str],
+    headers_items: tuple = (),
+    verify: Union[bool, str, ssl.SSLContext] = True,
+) -> _AiohttpBackend:
+    """Get the aiohttp backend for the given host, headers and SSL
+    verification, which is shared by all model wrappers targeting the same
+    server with the same settings."""
+    return _AiohttpBackend(
+        host=host,
+        headers=dict(headers_items),
+        verify=verify,
+    )
+
+
+class _ResponseCache:
+    """A thread-safe LRU cache of the responses of ollama model wrappers,
+    which is keyed by the serialized request arguments, so that identical
+    requests skip the round trip to the ollama server. The responses are
+    copied in and out, so that the callers cannot modify the cached ones."""
+
+    def __init__(self, max_size: int = 128) -> None:
+        """Initialize the response cache.
+
+        Args:
+            max_size (`int`, default `128`):
+                The maximum number of cached responses, where the least
+                recently used one is evicted when exceeded.
+        """
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kwargs: dict) -> str:
+        """Serialize the request arguments into a cache key."""
+        return _json_dumps(kwargs, sort_keys=True, default=str)
+
+    def get(self, key: str) -> Any:
+        """Get the cached response by the key, which is `None` if missed."""
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return copy.deepcopy(self._cache[key])
+
+    def put(self, key: str, response: Any) -> None:
+        """Cache the response with the key."""
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._cache[key] = response
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        """Clear the cached responses."""
+        with self._lock:
+            self._cache.clear()
@@ -1,14 +1,67 @@
 # -*- coding: utf-8 -*-
+# pylint: disable=too-many-lines
 """Model wrapper for Ollama models."""
+import asyncio
+import time
 from abc import ABC
-from typing import Sequence, Any, Optional, List, Union, Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from typing import (
+    Sequence,
+    Any,
+    Optional,
+    List,
+    Union,
+    Generator,
+    AsyncGenerator,
+    ContextManager,
+    Iterator,
+)
 
 from ._model_usage import ChatUsage
+from ._ollama_utils import (
+    _create_client,
+    _create_async_client,
+    _get_aiohttp_backend,
+    _HostBalancer,
+    _require_ollama,
+    _ResponseCache,
+)
 from ..formatters import CommonFormatter
 from ..message import Msg
 from ..models import ModelWrapperBase, ModelResponse
 
 
+def _maybe_usage(response: Any) -> Optional[ChatUsage]:
+    """Get the token usage from the response of ollama chat or generation
+    API, which is `None` if the token counts are not returned."""
+    prompt_tokens = response.get("prompt_eval_count")
+    completion_tokens = response.get("eval_count")
+    if prompt_tokens is None or completion_tokens is None:
+        return None
+    return ChatUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+    )
+
+
+def _with_content(chunk: Any, content: str) -> Any:
+    """Copy the last chunk of a chat stream with the message content
+    replaced by the full text, which leaves the chunk itself unchanged. The
+    chunk is either a dict or a pydantic model returned by the ollama
+    client."""
+    if hasattr(chunk, "model_copy"):
+        return chunk.model_copy(
+            update={
+                "message": chunk.message.model_copy(
+                    update={"content": content},
+                ),
+            },
+        )
+    return {**chunk, "message": {**chunk["message"], "content": content}}
+
+
 class OllamaWrapperBase(ModelWrapperBase, ABC):
     """The base class for Ollama model wrappers.
 
@@ -34,13 +87,21 @@ class OllamaWrapperBase(ModelWrapperBase, ABC):
     """Controls how long the model will stay loaded into memory following
     the request."""
 
+    max_concurrency: int
+    """The maximum number of concurrent requests issued by the async
+    methods of this model wrapper."""
+
     def __init__(
         self,
         config_name: str,
         model_name: str,
         options: dict = None,
         keep_alive: str = "5m",
-        host: Optional[Union[str, None]] = None,
+        host: Optional[Union[str, List[str]]] = None,
+        max_concurrency: int = 8,
+        use_aiohttp: bool = False,
+        cache_enabled: bool = False,
+        cache_size: int = 128,
         **kwargs: Any,
     ) -> None:
         """Initialize the model wrapper for Ollama API.
@@ -54,25 +115,382 @@ class OllamaWrapperBase(ModelWrapperBase, ABC):
             keep_alive (`str`, default `5m`):
                 Controls how long the model will stay loaded into memory
                 following the request.
-            host (`str`, default `None`):
+            host (`Union[str, List[str]]`, default `None`):
                 The host port of the ollama server.
-                Defaults to `None`, which is 127.0.0.1:11434.
+                Defaults to `None`, which is 127.0.0.1:11434. If a list of
+                hosts is given, each request is routed to the server with
+                the least estimated waiting time.
+            max_concurrency (`int`, default `8`):
+                The maximum number of concurrent requests issued by the
+                async methods of this model wrapper.
+            use_aiohttp (`bool`, default `False`):
+                Whether the async methods post requests to the ollama server
+                directly by aiohttp, rather than by `ollama.AsyncClient`,
+                which performs better under high concurrency. It requires
+                `ollama>=0.4.0`, and only supports the `headers` and
+                `verify` client arguments in the extra keyword arguments.
+            cache_enabled (`bool`, default `False`):
+                Whether to cache the responses of identical requests in
+                memory. Only the deterministic requests are cached, i.e.
+                not in stream mode, and with a `seed` or zero `temperature`
+                in the options for chat and generation.
+            cache_size (`int`, default `128`):
+                The maximum number of cached responses.
         """
 
         super().__init__(config_name=config_name, model_name=model_name)
 
         self.options = options
         self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+
+        self._semaphore = None
+        self._semaphore_loop = None
+
+        self._default_kwargs = None
+
+        self.response_cache = (
+            _ResponseCache(max_size=cache_size) if cache_enabled else None
+        )
+
+        ollama = _require_ollama()
+
+        hosts = list(host) if isinstance(host, (list, tuple)) else [host]
+        if not hosts:
+            raise ValueError("At least one host should be given.")
+
+        self.hosts = hosts
+        self.clients = [_create_client(_, kwargs) for _ in hosts]
+        self.balancer = _HostBalancer(hosts) if len(hosts) > 1 else None
+        self._single_host_route = nullcontext(0)
+
+        self.aiohttp_backends = None
+        if use_aiohttp:
+            try:
+                import aiohttp  # pylint: disable=W0611
+            except ImportError as e:
+                raise ImportError(
+                    "The package aiohttp is not found. Please install it by "
+                    "running command `pip install aiohttp`",
+                ) from e
+
+            # The request types of ollama are used to prepare the requests
+            if not hasattr(ollama, "Image"):
+                raise ImportError(
+                    "The aiohttp backend requires ollama>=0.4.0. Please "
+                    'upgrade it by running command `pip install -U "ollama>='
+                    '0.4.0"`',
+                )
+
+            # Only the headers and SSL verification are forwarded to the
+            # aiohttp sessions, and the other client arguments are rejected
+            # rather than silently ignored
+            unsupported = sorted(kwargs.keys() - {"headers", "verify"})
+            if unsupported:
+                raise ValueError(
+                    f"The client arguments {unsupported} are not supported "
+                    "by the aiohttp backend. Please set `use_aiohttp=False` "
+                    "to use them.",
+                )
+
+            headers = kwargs.get("headers") or {}
+            headers_items = tuple(sorted(headers.items()))
+            self.aiohttp_backends = [
+                _get_aiohttp_backend(
+                    _,
+                    headers_items,
+                    kwargs.get("verify", True),
+                )
+                for _ in hosts
+            ]
+
+        # The async clients are created in the running event loop
+        self._client_kwargs = kwargs
+        self._async_clients = None
+        self._async_clients_loop = None
+
+        # The clients of the first host, kept for backward compatibility
+        self.client = self.clients[0]
+        self.aiohttp_backend = (
+            self.aiohttp_backends[0] if self.aiohttp_backends else None
+        )
+
+    def map(
+        self,
+        inputs: Sequence[Any],
+        max_workers: int = 8,
+        **kwargs: Any,
+    ) -> List[ModelResponse]:
+        """Call the model on each of the inputs concurrently by a thread
+        pool, which is useful when asyncio is not available. The clients
+        are thread-safe, so the requests share one connection pool.
+
+        Example:
+
+        .. code-block:: python
+
+            responses = model.map(
+                [
+                    [{"role": "user", "content": "Hi!"}],
+                    [{"role": "user", "content": "What's the date today?"}],
+                ],
+                max_workers=4,
+            )
+
+        Args:
+            inputs (`Sequence[Any]`):
+                The inputs, each of which is passed to the model as the
+                first argument, e.g. the messages for chat, and the prompt
+                for embedding and generation.
+            max_workers (`int`, default `8`):
+                The maximum number of concurrent requests.
+            **kwargs (`Any`):
+                The keyword arguments passed to each call of the model.
 
+        Returns:
+            `List[ModelResponse]`:
+                The responses in the same order as the inputs.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(partial(self, **kwargs), inputs))
+
+    async def aclose(self) -> None:
+        """Close the aiohttp sessions of this model wrapper in the running
+        event loop, if the aiohttp backend is used. The sessions are shared
+        by the model wrappers targeting the same servers, and are created
+        again by their next requests. It should be called before the event
+        loop is closed, or the model wrapper can be used as an async context
+        manager instead.
+
+        Example:
+
+        .. code-block:: python
+
+            async with model:
+                response = await model.achat(messages)
+        """
+        if self.aiohttp_backends is not None:
+            await asyncio.gather(*[_.close() for _ in self.aiohttp_backends])
+
+    async def __aenter__(self) -> "OllamaWrapperBase":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore that bounds the concurrent requests of the async
+        methods. Since a semaphore is bound to an event loop, a new one is
+        created when the running event loop changes."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _get_async_clients(self) -> List[Any]:
+        """Get the async clients of the hosts for the running event loop.
+        Since the connection pool of an async client is bound to an event
+        loop, new clients are created when the running event loop changes,
+        e.g. in consecutive `asyncio.run` calls."""
+        loop = asyncio.get_running_loop()
+        if self._async_clients_loop is not loop:
+            self._async_clients = [
+                _create_async_client(_, self._client_kwargs)
+                for _ in self.hosts
+            ]
+            self._async_clients_loop = loop
+        return self._async_clients
+
+    def _merge_options(self, options: Optional[dict]) -> Optional[dict]:
+        """Merge the options of a call into the options in the constructor.
+        A new dict is created only when both of them are non-empty.
+
+        Args:
+            options (`Optional[dict]`):
+                The options which take effect only on this call.
+
+        Returns:
+            `Optional[dict]`:
+                The merged options.
+        """
+        if not options:
+            return self.options
+        if not self.options:
+            return options
+        return {**self.options, **options}
+
+    def _prepare_kwargs(
+        self,
+        options: Optional[dict],
+        keep_alive: Optional[str],
+    ) -> dict:
+        """Prepare the model name, options and keep_alive arguments of a
+        request. Without overriding in the call, the arguments only depend
+        on the constructor, so they are prepared once and copied for each
+        call, and prepared again only if the attributes are reassigned.
+
+        Args:
+            options (`Optional[dict]`):
+                The options which take effect only on this call.
+            keep_alive (`Optional[str]`):
+                The keep_alive which takes effect only on this call.
+
+        Returns:
+            `dict`:
+                A new dict of the prepared arguments.
+        """
+        if options or keep_alive:
+            return {
+                "model": self.model_name,
+                "options": self._merge_options(options),
+                "keep_alive": keep_alive or self.keep_alive,
+            }
+
+        default_kwargs = self._default_kwargs
+        if (
+            default_kwargs is None
+            or default_kwargs["model"] is not self.model_name
+            or default_kwargs["options"] is not self.options
+            or default_kwargs["keep_alive"] is not self.keep_alive
+        ):
+            default_kwargs = self._default_kwargs = {
+                "model": self.model_name,
+                "options": self.options,
+                "keep_alive": self.keep_alive,
+            }
+        return default_kwargs.copy()
+
+    def _lookup_cache(self, kwargs: dict, sampling: bool = True) -> tuple:
+        """Look up the response cache by the request arguments. A cache hit
+        is still recorded in the model invocations, but without usage and
+        monitor update since no tokens are consumed.
+
+        Args:
+            kwargs (`dict`):
+                The arguments of the request.
+            sampling (`bool`, default `True`):
+                Whether the response is sampled according to the options,
+                so that it's cached only with a `seed` or zero `temperature`.
+
+        Returns:
+            `tuple`:
+                The cache key, which is `None` if the response shouldn't be
+                cached, and the cached response, which is `None` if missed.
+        """
+        if self.response_cache is None:
+            return None, None
+
+        options = kwargs.get("options") or {}
+        if (
+            sampling
+            and options.get("seed") is None
+            and options.get("temperature") != 0
+        ):
+            return None, None
+
+        key = self.response_cache.make_key(
+            {k: v for k, v in kwargs.items() if k != "keep_alive"},
+        )
+        response = self.response_cache.get(key)
+        if response is not None:
+            self._save_model_invocation(arguments=kwargs, response=response)
+        return key, response
+
+    def _route(self, stream: bool = False) -> ContextManager[int]:
+        """Route a request to a server, which is the least loaded one if
+        multiple hosts are given, and return a context that yields its
+        index. With a single host, a reusable context created in the
+        constructor is returned, which skips the bookkeeping per request."""
+        if self.balancer is None:
+            return self._single_host_route
+        return self._balanced_route(stream)
+
+    @contextmanager
+    def _balanced_route(self, stream: bool) -> Iterator[int]:
+        """Route a request to the least loaded server by the balancer. The
+        request is counted as in-flight on the server until the context
+        exits. For a stream request, the latency is observed by the caller
+        at the first chunk instead, since the rest of the stream is read at
+        the pace of the consumer."""
+        index = self.balancer.acquire()
+        start = time.perf_counter()
         try:
-            import ollama
-        except ImportError as e:
-            raise ImportError(
-                "The package ollama is not found. Please install it by "
-                'running command `pip install "ollama>=0.1.7"`',
-            ) from e
+            yield index
+        except Exception:
+            self.balancer.release(index, None, failed=True)
+            raise
+        except BaseException:
+            # Cancelled by the caller, e.g. asyncio.CancelledError on a
+            # timeout, or GeneratorExit when a stream is closed early
+            self.balancer.cancel(index)
+            raise
+        self.balancer.release(
+            index,
+            None if stream else time.perf_counter() - start,
+            failed=False,
+        )
 
-        self.client = ollama.Client(host=host, **kwargs)
+    def _observe_first_chunk(self, index: int, start: float) -> None:
+        """Observe the latency of a stream request at its first chunk."""
+        if self.balancer is not None:
+            self.balancer.observe(index, time.perf_counter() - start)
+
+    def _request(self, api: str, **kwargs: Any) -> Any:
+        """Send a non-stream request to the given ollama API, e.g. "chat",
+        by the sync client."""
+        with self._route() as index:
+            return getattr(self.clients[index], api)(**kwargs)
+
+    def _request_stream(self, api: str, **kwargs: Any) -> Generator:
+        """Send a stream request to the given ollama API by the sync client,
+        and yield the chunks."""
+        with self._route(stream=True) as index:
+            start = time.perf_counter()
+            first = True
+            for chunk in getattr(self.clients[index], api)(**kwargs):
+                if first:
+                    self._observe_first_chunk(index, start)
+                    first = False
+                yield chunk
+
+    async def _arequest(self, api: str, **kwargs: Any) -> Any:
+        """Send a non-stream request to the given ollama API, e.g. "chat", by
+        the aiohttp backend if enabled, otherwise by the async client."""
+        with self._route() as index:
+            if self.aiohttp_backends is not None:
+                return await self.aiohttp_backends[index].request(
+                    f"/api/{api}",
+                    kwargs,
+                )
+            client = self._get_async_clients()[index]
+            return await getattr(client, api)(**kwargs)
+
+    async def _arequest_stream(
+        self,
+        api: str,
+        **kwargs: Any,
+    ) -> AsyncGenerator:
+        """Send a stream request to the given ollama API by the aiohttp
+        backend if enabled, otherwise by the async client, and yield the
+        chunks."""
+        with self._route(stream=True) as index:
+            start = time.perf_counter()
+            if self.aiohttp_backends is not None:
+                response = self.aiohttp_backends[index].stream(
+                    f"/api/{api}",
+                    kwargs,
+                )
+            else:
+                client = self._get_async_clients()[index]
+                response = await getattr(client, api)(**kwargs)
+
+            first = True
+            async for chunk in response:
+                if first:
+                    self._observe_first_chunk(index, start)
+                    first = False
+                yield chunk
 
 
 class OllamaChatWrapper(OllamaWrapperBase):
@@ -111,7 +529,11 @@ class OllamaChatWrapper(OllamaWrapperBase):
         stream: bool = False,
         options: dict = None,
         keep_alive: str = "5m",
-        host: Optional[Union[str, None]] = None,
+        host: Optional[Union[str, List[str]]] = None,
+        max_concurrency: int = 8,
+        use_aiohttp: bool = False,
+        cache_enabled: bool = False,
+        cache_size: int = 128,
         **kwargs: Any,
     ) -> None:
         """Initialize the model wrapper for Ollama API.
@@ -127,9 +549,27 @@ class OllamaChatWrapper(OllamaWrapperBase):
             keep_alive (`str`, default `5m`):
                 Controls how long the model will stay loaded into memory
                 following the request.
-            host (`str`, default `None`):
+            host (`Union[str, List[str]]`, default `None`):
                 The host port of the ollama server.
-                Defaults to `None`, which is 127.0.0.1:11434.
+                Defaults to `None`, which is 127.0.0.1:11434. If a list of
+                hosts is given, each request is routed to the server with
+                the least estimated waiting time.
+            max_concurrency (`int`, default `8`):
+                The maximum number of concurrent requests issued by the
+                async methods of this model wrapper.
+            use_aiohttp (`bool`, default `False`):
+                Whether the async methods post requests to the ollama server
+                directly by aiohttp, rather than by `ollama.AsyncClient`,
+                which performs better under high concurrency. It requires
+                `ollama>=0.4.0`, and only supports the `headers` and
+                `verify` client arguments in the extra keyword arguments.
+            cache_enabled (`bool`, default `False`):
+                Whether to cache the responses of identical requests in
+                memory. Only the deterministic requests are cached, i.e.
+                not in stream mode, and with a `seed` or zero `temperature`
+                in the options for chat and generation.
+            cache_size (`int`, default `128`):
+                The maximum number of cached responses.
         """
 
         super().__init__(
@@ -138,6 +578,10 @@ class OllamaChatWrapper(OllamaWrapperBase):
             options=options,
             keep_alive=keep_alive,
             host=host,
+            max_concurrency=max_concurrency,
+            use_aiohttp=use_aiohttp,
+            cache_enabled=cache_enabled,
+            cache_size=cache_size,
             **kwargs,
         )
 
@@ -149,6 +593,7 @@ class OllamaChatWrapper(OllamaWrapperBase):
         stream: Optional[bool] = None,
         options: Optional[dict] = None,
         keep_alive: Optional[str] = None,
+        delta: bool = False,
         **kwargs: Any,
     ) -> ModelResponse:
         """Generate response from the given messages.
@@ -169,6 +614,12 @@ class OllamaChatWrapper(OllamaWrapperBase):
                 How long the model will stay loaded into memory following
                 the request, which takes effect only on this call, and will
                 override the `keep_alive` input in the constructor.
+            delta (`bool`, default `False`):
+                In stream mode, whether to yield the new content of each
+                chunk rather than the accumulated text, which reduces the
+                data passed to the consumer from quadratic to linear in the
+                response length. The `text` field of the response still
+                holds the full text once the stream is exhausted.
 
         Returns:
             `ModelResponse`:
@@ -176,65 +627,177 @@ class OllamaChatWrapper(OllamaWrapperBase):
                 `raw` field.
         """
         # step1: prepare parameters accordingly
-        if options is None:
-            options = self.options
-        else:
-            options = {**self.options, **options}
-
-        keep_alive = keep_alive or self.keep_alive
-
-        # step2: forward to generate response
         if stream is None:
             stream = self.stream
 
         kwargs.update(
-            {
-                "model": self.model_name,
-                "messages": messages,
-                "stream": stream,
-                "options": options,
-                "keep_alive": keep_alive,
-            },
+            self._prepare_kwargs(options, keep_alive),
+            messages=messages,
+            stream=stream,
         )
 
-        response = self.client.chat(**kwargs)
+        # step2: forward to generate response
 
         if stream:
+            response = self._request_stream("chat", **kwargs)
 
             def generator() -> Generator[str, None, None]:
                 last_chunk = {}
                 text = ""
+                parts = []
+                # The pieces are joined once at the end in delta mode, while
+                # the cumulative text is extended by each piece otherwise
                 for chunk in response:
-                    text += chunk["message"]["content"]
-                    yield text
+                    piece = chunk["message"]["content"]
                     last_chunk = chunk
+                    if delta:
+                        parts.append(piece)
+                        yield piece
+                    else:
+                        text += piece
+                        yield text
 
-                # Replace the last chunk with the full text
-                last_chunk["message"]["content"] = text
+                if delta:
+                    text = "".join(parts)
 
                 self._save_model_invocation_and_update_monitor(
                     kwargs,
-                    last_chunk,
+                    _with_content(last_chunk, text),
                 )
 
             return ModelResponse(
                 stream=generator(),
                 raw=response,
+                delta=delta,
             )
 
-        else:
+        cache_key, response = self._lookup_cache(kwargs)
+        if response is None:
+            response = self._request("chat", **kwargs)
+
             # step3: save model invocation and update monitor
             self._save_model_invocation_and_update_monitor(
                 kwargs,
                 response,
             )
 
-            # step4: return response
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return ModelResponse(
+            text=response["message"]["content"],
+            raw=response,
+        )
+
+    async def achat(
+        self,
+        messages: Sequence[dict],
+        stream: Optional[bool] = None,
+        options: Optional[dict] = None,
+        keep_alive: Optional[str] = None,
+        delta: bool = False,
+        **kwargs: Any,
+    ) -> ModelResponse:
+        """The async version of `__call__`, which generates response from the
+        given messages without blocking the event loop. The number of
+        concurrent requests is bounded by `max_concurrency`.
+
+        Args:
+            messages (`Sequence[dict]`):
+                A list of messages, each message is a dict contains the `role`
+                and `content` of the message.
+            stream (`bool`, default `None`):
+                Whether to enable stream mode, which will override the `stream`
+                input in the constructor.
+            options (`dict`, default `None`):
+                The extra arguments used in ollama chat API, which takes
+                effect only on this call, and will be merged with the
+                `options` input in the constructor,
+                e.g. `{"temperature": 0., "seed": 123}`.
+            keep_alive (`str`, default `None`):
+                How long the model will stay loaded into memory following
+                the request, which takes effect only on this call, and will
+                override the `keep_alive` input in the constructor.
+            delta (`bool`, default `False`):
+                In stream mode, whether to yield the new content of each
+                chunk rather than the accumulated text, which reduces the
+                data passed to the consumer from quadratic to linear in the
+                response length. The `text` field of the response still
+                holds the full text once the stream is exhausted.
+
+        Returns:
+            `ModelResponse`:
+                The response text in `text` field, and the raw response in
+                `raw` field. In stream mode, the `stream` field is an async
+                generator.
+        """
+        # step1: prepare parameters accordingly
+        if stream is None:
+            stream = self.stream
+
+        kwargs.update(
+            self._prepare_kwargs(options, keep_alive),
+            messages=messages,
+            stream=stream,
+        )
+
+        # step2: forward to generate response
+
+        if stream:
+            response = self._arequest_stream("chat", **kwargs)
+
+            async def agenerator() -> AsyncGenerator[str, None]:
+                last_chunk = {}
+                text = ""
+                parts = []
+                # The request is sent when the stream is iterated, so the
+                # semaphore is held until the stream is exhausted
+                async with self._get_semaphore():
+                    async for chunk in response:
+                        piece = chunk["message"]["content"]
+                        last_chunk = chunk
+                        if delta:
+                            parts.append(piece)
+                            yield piece
+                        else:
+                            text += piece
+                            yield text
+
+                if delta:
+                    text = "".join(parts)
+
+                self._save_model_invocation_and_update_monitor(
+                    kwargs,
+                    _with_content(last_chunk, text),
+                )
+
             return ModelResponse(
-                text=response["message"]["content"],
+                stream=agenerator(),
                 raw=response,
+                delta=delta,
             )
 
+        cache_key, response = self._lookup_cache(kwargs)
+        if response is None:
+            async with self._get_semaphore():
+                response = await self._arequest("chat", **kwargs)
+
+            # step3: save model invocation and update monitor
+            self._save_model_invocation_and_update_monitor(
+                kwargs,
+                response,
+            )
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return ModelResponse(
+            text=response["message"]["content"],
+            raw=response,
+        )
+
     def _save_model_invocation_and_update_monitor(
         self,
         kwargs: dict,
@@ -248,17 +811,13 @@ class OllamaChatWrapper(OllamaWrapperBase):
             response (`dict`):
                 The response object returned by the DashScope chat API.
         """
-        if "prompt_eval_count" in response and "eval_count" in response:
-            formatted_usage = ChatUsage(
-                prompt_tokens=response.get("prompt_eval_count", 0),
-                completion_tokens=response.get("eval_count", 0),
-            )
-        else:
-            formatted_usage = None
+        formatted_usage = _maybe_usage(response)
 
         if formatted_usage:
             self.monitor.update_text_and_embedding_tokens(
                 model_name=self.model_name,
+                prompt_tokens=formatted_usage.usage.prompt_tokens,
+                completion_tokens=formatted_usage.usage.completion_tokens,
             )
 
         self._save_model_invocation(
@@ -329,6 +888,10 @@ class OllamaChatWrapper(OllamaWrapperBase):
         """
         if multi_agent_mode:
             return CommonFormatter.format_multi_agent(*args)
+
+        # Nothing to format in chat mode, where `None` inputs are ignored
+        if all(_ is None for _ in args):
+            return []
         return CommonFormatter.format_chat(*args)
 
 
@@ -349,13 +912,19 @@ class OllamaEmbeddingWrapper(OllamaWrapperBase):
                 ]]
             }
 
+    Note:
+        A list of prompts is embedded in one request by the batched
+        `/api/embed` endpoint, which requires `ollama>=0.3.0`. Batches of
+        32 to 64 prompts are recommended to amortize the per-request
+        overhead without exhausting the memory of the server.
+
     """
 
     model_type: str = "ollama_embedding"
 
     def __call__(
         self,
-        prompt: str,
+        prompt: Union[str, List[str]],
         options: Optional[dict] = None,
         keep_alive: Optional[str] = None,
         **kwargs: Any,
@@ -363,8 +932,9 @@ class OllamaEmbeddingWrapper(OllamaWrapperBase):
         """Generate embedding from the given prompt.
 
         Args:
-            prompt (`str`):
-                The prompt to generate response.
+            prompt (`Union[str, List[str]]`):
+                The prompt to generate embedding, or a list of prompts to
+                generate embeddings in one request.
             options (`dict`, default `None`):
                 The extra arguments used in ollama embedding API, which takes
                 effect only on this call, and will be merged with the
@@ -381,45 +951,205 @@ class OllamaEmbeddingWrapper(OllamaWrapperBase):
                 response in `raw` field.
         """
         # step1: prepare parameters accordingly
-        if options is None:
-            options = self.options
-        else:
-            options = {**self.options, **options}
+        arguments = self._prepare_kwargs(options, keep_alive)
+        arguments.update(prompt=prompt, **kwargs)
 
-        keep_alive = keep_alive or self.keep_alive
+        # step2: forward to generate response
+        cache_key, response = self._lookup_cache(arguments, sampling=False)
+        if response is None:
+            if isinstance(prompt, list):
+                response = self._request(
+                    "embed",
+                    model=self.model_name,
+                    input=prompt,
+                    options=arguments["options"],
+                    keep_alive=arguments["keep_alive"],
+                    **kwargs,
+                )
+            else:
+                response = self._request("embeddings", **arguments)
+
+            # step3: record the api invocation and monitor the response
+            self._save_model_invocation_and_update_monitor(
+                arguments,
+                response,
+            )
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return self._to_model_response(prompt, response)
+
+    async def aembed(
+        self,
+        prompt: Union[str, List[str]],
+        options: Optional[dict] = None,
+        keep_alive: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ModelResponse:
+        """The async version of `__call__`, which generates embedding from
+        the given prompt without blocking the event loop. The number of
+        concurrent requests is bounded by `max_concurrency`.
+
+        Args:
+            prompt (`Union[str, List[str]]`):
+                The prompt to generate embedding, or a list of prompts to
+                generate embeddings in one request.
+            options (`dict`, default `None`):
+                The extra arguments used in ollama embedding API, which takes
+                effect only on this call, and will be merged with the
+                `options` input in the constructor,
+                e.g. `{"temperature": 0., "seed": 123}`.
+            keep_alive (`str`, default `None`):
+                How long the model will stay loaded into memory following
+                the request, which takes effect only on this call, and will
+                override the `keep_alive` input in the constructor.
+
+        Returns:
+            `ModelResponse`:
+                The response embedding in `embedding` field, and the raw
+                response in `raw` field.
+        """
+        # step1: prepare parameters accordingly
+        arguments = self._prepare_kwargs(options, keep_alive)
+        arguments.update(prompt=prompt, **kwargs)
 
         # step2: forward to generate response
-        response = self.client.embeddings(
-            model=self.model_name,
-            prompt=prompt,
-            options=options,
-            keep_alive=keep_alive,
-            **kwargs,
-        )
+        cache_key, response = self._lookup_cache(arguments, sampling=False)
+        if response is None:
+            async with self._get_semaphore():
+                if isinstance(prompt, list):
+                    response = await self._arequest(
+                        "embed",
+                        model=self.model_name,
+                        input=prompt,
+                        options=arguments["options"],
+                        keep_alive=arguments["keep_alive"],
+                        **kwargs,
+                    )
+                else:
+                    response = await self._arequest("embeddings", **arguments)
+
+            # step3: record the api invocation and monitor the response
+            self._save_model_invocation_and_update_monitor(
+                arguments,
+                response,
+            )
 
-        # step3: record the api invocation if needed
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return self._to_model_response(prompt, response)
+
+    def _save_model_invocation_and_update_monitor(
+        self,
+        kwargs: dict,
+        response: Any,
+    ) -> None:
+        """Save the model invocation and update the monitor accordingly.
+
+        Args:
+            kwargs (`dict`):
+                The keyword arguments to the ollama embedding API.
+            response (`Any`):
+                The response object returned by the ollama embedding API.
+        """
         self._save_model_invocation(
-            arguments={
-                "model": self.model_name,
-                "prompt": prompt,
-                "options": options,
-                "keep_alive": keep_alive,
-                **kwargs,
-            },
+            arguments=kwargs,
             response=response,
         )
 
-        # step4: monitor the response
         self.monitor.update_text_and_embedding_tokens(
             model_name=self.model_name,
         )
 
-        # step5: return response
+    @staticmethod
+    def _to_model_response(
+        prompt: Union[str, List[str]],
+        response: Any,
+    ) -> ModelResponse:
+        """Wrap the response of the single or batched embedding API into a
+        `ModelResponse` object."""
+        if isinstance(prompt, list):
+            embedding = response["embeddings"]
+        else:
+            embedding = [response["embedding"]]
+
         return ModelResponse(
-            embedding=[response["embedding"]],
+            embedding=embedding,
             raw=response,
         )
 
+    async def abatch(
+        self,
+        prompts: List[str],
+        batch_size: int = 50,
+        max_concurrency: Optional[int] = None,
+        options: Optional[dict] = None,
+        keep_alive: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ModelResponse:
+        """Generate embeddings for a large number of prompts, which are
+        split into mini-batches and embedded by concurrent batched requests.
+
+        Args:
+            prompts (`List[str]`):
+                The prompts to generate embeddings.
+            batch_size (`int`, default `50`):
+                The number of prompts embedded in one request.
+            max_concurrency (`int`, default `None`):
+                The maximum number of concurrent requests in this call.
+                Defaults to `None`, which is bounded by the `max_concurrency`
+                input in the constructor only.
+            options (`dict`, default `None`):
+                The extra arguments used in ollama embedding API, which takes
+                effect only on this call, and will be merged with the
+                `options` input in the constructor,
+                e.g. `{"temperature": 0., "seed": 123}`.
+            keep_alive (`str`, default `None`):
+                How long the model will stay loaded into memory following
+                the request, which takes effect only on this call, and will
+                override the `keep_alive` input in the constructor.
+
+        Returns:
+            `ModelResponse`:
+                The response embeddings in `embedding` field in the same
+                order as the prompts, and the raw responses of all
+                mini-batches in `raw` field.
+        """
+        if batch_size <= 0:
+            raise ValueError(
+                f"The batch size should be positive, but got {batch_size}.",
+            )
+
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> ModelResponse:
+            async with semaphore:
+                return await self.aembed(
+                    batch,
+                    options=options,
+                    keep_alive=keep_alive,
+                    **kwargs,
+                )
+
+        batches = [
+            prompts[i : i + batch_size]
+            for i in range(0, len(prompts), batch_size)
+        ]
+        responses = await asyncio.gather(*[embed_batch(_) for _ in batches])
+
+        return ModelResponse(
+            embedding=[
+                embedding
+                for response in responses
+                for embedding in response.embedding
+            ],
+            raw=[response.raw for response in responses],
+        )
+
 
 class OllamaGenerationWrapper(OllamaWrapperBase):
     """The model wrapper for Ollama generation API.
@@ -477,52 +1207,119 @@ class OllamaGenerationWrapper(OllamaWrapperBase):
 
         """
         # step1: prepare parameters accordingly
-        if options is None:
-            options = self.options
-        else:
-            options = {**self.options, **options}
-
-        keep_alive = keep_alive or self.keep_alive
+        arguments = self._prepare_kwargs(options, keep_alive)
+        arguments.update(prompt=prompt, **kwargs)
 
         # step2: forward to generate response
-        response = self.client.generate(
-            model=self.model_name,
-            prompt=prompt,
-            options=options,
-            keep_alive=keep_alive,
+        cache_key, response = self._lookup_cache(arguments)
+        if response is None:
+            response = self._request(
+                "generate",
+                model=self.model_name,
+                prompt=prompt,
+                options=arguments["options"],
+                keep_alive=arguments["keep_alive"],
+            )
+
+            # step3: record the api invocation and monitor the response
+            self._save_model_invocation_and_update_monitor(
+                arguments,
+                response,
+            )
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return ModelResponse(
+            text=response["response"],
+            raw=response,
         )
 
-        # step3: record the api invocation if needed
-        if "prompt_eval_count" in response and "eval_count" in response:
-            formatted_usage = ChatUsage(
-                prompt_tokens=response.get("prompt_eval_count", 0),
-                completion_tokens=response.get("eval_count", 0),
+    async def agenerate(
+        self,
+        prompt: str,
+        options: Optional[dict] = None,
+        keep_alive: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ModelResponse:
+        """The async version of `__call__`, which generates response from the
+        given prompt without blocking the event loop. The number of
+        concurrent requests is bounded by `max_concurrency`.
+
+        Args:
+            prompt (`str`):
+                The prompt to generate response.
+            options (`dict`, default `None`):
+                The extra arguments used in ollama generation API, which takes
+                effect only on this call, and will be merged with the
+                `options` input in the constructor,
+                e.g. `{"temperature": 0., "seed": 123}`.
+            keep_alive (`str`, default `None`):
+                How long the model will stay loaded into memory following
+                the request, which takes effect only on this call, and will
+                override the `keep_alive` input in the constructor.
+
+        Returns:
+            `ModelResponse`:
+                The response text in `text` field, and the raw response in
+                `raw` field.
+        """
+        # step1: prepare parameters accordingly
+        arguments = self._prepare_kwargs(options, keep_alive)
+        arguments.update(prompt=prompt, **kwargs)
+
+        # step2: forward to generate response
+        cache_key, response = self._lookup_cache(arguments)
+        if response is None:
+            async with self._get_semaphore():
+                response = await self._arequest(
+                    "generate",
+                    model=self.model_name,
+                    prompt=prompt,
+                    options=arguments["options"],
+                    keep_alive=arguments["keep_alive"],
+                )
+
+            # step3: record the api invocation and monitor the response
+            self._save_model_invocation_and_update_monitor(
+                arguments,
+                response,
             )
-        else:
-            formatted_usage = None
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, response)
+
+        # step4: return response
+        return ModelResponse(
+            text=response["response"],
+            raw=response,
+        )
+
+    def _save_model_invocation_and_update_monitor(
+        self,
+        kwargs: dict,
+        response: Any,
+    ) -> None:
+        """Save the model invocation and update the monitor accordingly.
+
+        Args:
+            kwargs (`dict`):
+                The keyword arguments to the ollama generation API.
+            response (`Any`):
+                The response object returned by the ollama generation API.
+        """
+        formatted_usage = _maybe_usage(response)
 
         self._save_model_invocation(
-            arguments={
-                "model": self.model_name,
-                "prompt": prompt,
-                "options": options,
-                "keep_alive": keep_alive,
-                **kwargs,
-            },
+            arguments=kwargs,
             response=response,
             usage=formatted_usage,
         )
 
-        # step4: monitor the response
         if formatted_usage:
             self.monitor.update_text_and_embedding_tokens(
                 model_name=self.model_name,
-                prompt_tokens=response.get("prompt_eval_count", 0),
-                completion_tokens=response.get("eval_count", 0),
+                prompt_tokens=formatted_usage.usage.prompt_tokens,
+                completion_tokens=formatted_usage.usage.completion_tokens,
             )
-
-        # step5: return response
-        return ModelResponse(
-            text=response["response"],
-            raw=response,
-        )
@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
 """Parser for model response."""
+import inspect
 import json
-from typing import Optional, Sequence, Any, Generator, Union, Tuple
+from typing import (
+    Optional,
+    Sequence,
+    Any,
+    Generator,
+    AsyncGenerator,
+    Union,
+    Tuple,
+)
 
 from ..message import ToolUseBlock
 from ..utils.common import _is_json_serializable
@@ -21,8 +30,11 @@ class ModelResponse:
         image_urls: Optional[Sequence[str]] = None,
         raw: Any = None,
         parsed: Optional[Any] = None,
-        stream: Optional[Generator[str, None, None]] = None,
+        stream: Optional[
+            Union[Generator[str, None, None], AsyncGenerator[str, None]]
+        ] = None,
         tool_calls: Optional[list[ToolUseBlock]] = None,
+        delta: bool = False,
     ) -> None:
         """Initialize the model response.
 
@@ -37,10 +49,16 @@ class ModelResponse:
                 The raw data returned by the model.
             parsed (`Any`, optional):
                 The parsed data returned by the model.
-            stream (`Generator`, optional):
-                The stream data returned by the model.
+            stream (`Union[Generator, AsyncGenerator]`, optional):
+                The stream data returned by the model. For an async
+                generator, the `stream` field should be iterated by
+                `async for`.
             tool_calls (`Optional[list[dict]]`, defaults to `None`):
                 The tool calls made by the model.
+            delta (`bool`, defaults to `False`):
+                Whether the stream yields the new content of each chunk
+                rather than the accumulated text. If so, the chunks are
+                joined into the text field once the stream is exhausted.
         """
         self._text = text
         self.embedding = embedding
@@ -50,15 +68,19 @@ class ModelResponse:
         self._stream = stream
         self.tool_calls = tool_calls
         self._is_stream_exhausted = False
+        self._delta = delta
+        self._chunks: list[str] = []
 
     @property
     def text(self) -> Union[str, None]:
         """Return the text field. If the stream field is available, the text
         field will be updated accordingly."""
         if self._text is None:
-            if self.stream is not None:
-                for _, chunk in self.stream:
-                    self._text = chunk
+            if self.stream is not None and not inspect.isasyncgen(
+                self._stream,
+            ):
+                for _ in self.stream:
+                    pass
         return self._text
 
     @text.setter
@@ -67,13 +89,32 @@ class ModelResponse:
         self._text = value
 
     @property
-    def stream(self) -> Union[None, Generator[Tuple[bool, str], None, None]]:
+    def stream(
+        self,
+    ) -> Union[
+        None,
+        Generator[Tuple[bool, str], None, None],
+        AsyncGenerator[Tuple[bool, str], None],
+    ]:
         """Return the stream generator if it exists."""
         if self._stream is None:
             return self._stream
+        elif inspect.isasyncgen(self._stream):
+            return self._async_stream_generator_wrapper()
         else:
             return self._stream_generator_wrapper()
 
+    def _update_text(self, chunk: str, is_last: bool) -> None:
+        """Update the text field with the chunk from the stream, which is
+        accumulated in delta mode and replaces the text field otherwise."""
+        if not self._delta:
+            self._text = chunk
+            return
+
+        self._chunks.append(chunk)
+        if is_last:
+            self._text = "".join(self._chunks)
+
     @property
     def is_stream_exhausted(self) -> bool:
         """Whether the stream has been processed already."""
@@ -98,16 +139,42 @@ class ModelResponse:
             last_text = next(self._stream)
 
             for text in self._stream:
-                self._text = last_text
+                self._update_text(last_text, is_last=False)
                 yield False, last_text
                 last_text = text
-            self._text = last_text
+            self._update_text(last_text, is_last=True)
             yield True, last_text
 
             return
         except StopIteration:
             return
 
+    async def _async_stream_generator_wrapper(
+        self,
+    ) -> AsyncGenerator[Tuple[bool, str], None]:
+        """The async version of `_stream_generator_wrapper`, which updates
+        the text field during processing the async stream generator."""
+        if self._is_stream_exhausted:
+            raise RuntimeError(
+                "The stream has been processed already. Try to obtain the "
+                "result from the text field.",
+            )
+
+        try:
+            # The built-in anext is not available in Python 3.9
+            last_text = await self._stream.__anext__()  # pylint: disable=C2801
+
+            async for text in self._stream:
+                self._update_text(last_text, is_last=False)
+                yield False, last_text
+                last_text = text
+            self._update_text(last_text, is_last=True)
+            yield True, last_text
+
+            return
+        except StopAsyncIteration:
+            return
+
     def __str__(self) -> str:
         if _is_json_serializable(self.raw):
             raw = self.raw
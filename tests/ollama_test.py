@@ -1,9 +1,24 @@
 # -*- coding: utf-8 -*-
+# pylint: disable=too-many-lines
 """Unit test for Ollama model APIs."""
+import asyncio
+import json
+import sys
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncGenerator
+from unittest.mock import patch, MagicMock, AsyncMock
+import httpx
+import ollama
 import agentscope
 from agentscope.manager import ModelManager, ASManager
+from agentscope.models._ollama_utils import (
+    _AiohttpBackend,
+    _async_clients,
+    _get_client,
+    _get_aiohttp_backend,
+)
 
 
 class OllamaModelWrapperTest(unittest.TestCase):
@@ -102,13 +117,143 @@ class OllamaModelWrapperTest(unittest.TestCase):
             disable_saving=True,
         )
 
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_chat",
+        )
+        with patch.object(
+            model.monitor,
+            "update_text_and_embedding_tokens",
+        ) as mock_update:
+            response = model(messages=[{"role": "user", "content": "Hi!"}])
+
+        self.assertEqual(response.raw, self.dummy_response)
+        mock_update.assert_called_once_with(
+            model_name="llama2",
+            prompt_tokens=22,
+            completion_tokens=26,
+        )
+
+    @patch("ollama.Client")
+    def test_ollama_chat_stream(self, mock_ollama_client: MagicMock) -> None:
+        """Unit test for ollama chat API in stream mode."""
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat.return_value = iter(
+            [
+                {"message": {"role": "assistant", "content": content}}
+                for content in ["Hello", " world", "!"]
+            ],
+        )
+
+        # run test
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_chat",
+                "model_type": "ollama_chat",
+                "model_name": "llama2",
+                "stream": True,
+            },
+            disable_saving=True,
+        )
+
         model = ModelManager.get_instance().get_model_by_config_name(
             "my_ollama_chat",
         )
         response = model(messages=[{"role": "user", "content": "Hi!"}])
 
+        self.assertListEqual(
+            list(response.stream),
+            [(False, "Hello"), (False, "Hello world"), (True, "Hello world!")],
+        )
+        self.assertEqual(response.text, "Hello world!")
+
+        # the stream yields the new content of each chunk in delta mode
+        mock_client_instance.chat.return_value = iter(
+            [
+                {"message": {"role": "assistant", "content": content}}
+                for content in ["Hello", " world", "!"]
+            ],
+        )
+        response = model(
+            messages=[{"role": "user", "content": "Hi!"}],
+            delta=True,
+        )
+
+        self.assertListEqual(
+            list(response.stream),
+            [(False, "Hello"), (False, " world"), (True, "!")],
+        )
+        self.assertEqual(response.text, "Hello world!")
+
+        # the full text is saved without modifying the chunks returned by
+        # the ollama client
+        chunks = [
+            ollama.ChatResponse(
+                message=ollama.Message(role="assistant", content=content),
+            )
+            for content in ["Hello", " world", "!"]
+        ]
+        mock_client_instance.chat.return_value = iter(chunks)
+        with patch.object(model, "_save_model_invocation") as mock_save:
+            response = model(messages=[{"role": "user", "content": "Hi!"}])
+            self.assertEqual(response.text, "Hello world!")
+
+        saved = mock_save.call_args.kwargs["response"]
+        self.assertEqual(saved["message"]["content"], "Hello world!")
+        self.assertEqual(chunks[-1]["message"]["content"], "!")
+
+    @patch("ollama.Client")
+    def test_ollama_response_cache(
+        self,
+        mock_ollama_client: MagicMock,
+    ) -> None:
+        """Test that the deterministic responses are cached."""
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat.return_value = self.dummy_response
+
+        # run test
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_chat",
+                "model_type": "ollama_chat",
+                "model_name": "llama2",
+                "options": {"seed": 123},
+                "cache_enabled": True,
+            },
+            disable_saving=True,
+        )
+
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_chat",
+        )
+        messages = [{"role": "user", "content": "Hi!"}]
+        with patch.object(model, "_save_model_invocation") as mock_save:
+            responses = [model(messages=messages) for _ in range(3)]
+
+        for response in responses:
+            self.assertEqual(response.raw, self.dummy_response)
+        self.assertEqual(mock_client_instance.chat.call_count, 1)
+
+        # the cache hits are still recorded in the model invocations
+        self.assertEqual(mock_save.call_count, 3)
+
+        # modifying a returned response doesn't affect the cached one
+        responses[1].raw["message"]["content"] = "Modified"
+        response = model(messages=messages)
         self.assertEqual(response.raw, self.dummy_response)
 
+        # different messages miss the cache
+        model(messages=[{"role": "user", "content": "Bye!"}])
+        self.assertEqual(mock_client_instance.chat.call_count, 2)
+
+        # sampled responses without seed are not cached
+        model(messages=messages, options={"seed": None})
+        model(messages=messages, options={"seed": None})
+        self.assertEqual(mock_client_instance.chat.call_count, 4)
+
     @patch("ollama.Client")
     def test_ollama_embedding(self, mock_ollama_client: MagicMock) -> None:
         """Unit test for ollama embeddings API."""
@@ -138,6 +283,47 @@ class OllamaModelWrapperTest(unittest.TestCase):
 
         self.assertEqual(response.raw, self.dummy_embedding)
 
+    @patch("ollama.Client")
+    def test_ollama_embedding_batch(
+        self,
+        mock_ollama_client: MagicMock,
+    ) -> None:
+        """Unit test for ollama batched embed API."""
+        dummy_embeddings = {
+            "model": "llama2",
+            "embeddings": [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]],
+        }
+
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.embed.return_value = dummy_embeddings
+
+        # run test
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_embedding",
+                "model_type": "ollama_embedding",
+                "model_name": "llama2",
+            },
+            disable_saving=True,
+        )
+
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_embedding",
+        )
+        response = model(prompt=["Hi!", "Bye!"])
+
+        self.assertListEqual(
+            response.embedding,
+            dummy_embeddings["embeddings"],
+        )
+        self.assertListEqual(
+            mock_client_instance.embed.call_args.kwargs["input"],
+            ["Hi!", "Bye!"],
+        )
+        mock_client_instance.embeddings.assert_not_called()
+
     @patch("ollama.Client")
     def test_ollama_generate(self, mock_ollama_client: MagicMock) -> None:
         """Unit test for ollama generate API."""
@@ -165,9 +351,694 @@ class OllamaModelWrapperTest(unittest.TestCase):
 
         self.assertEqual(response.raw, self.dummy_generate)
 
+        # call the model concurrently by a thread pool
+        responses = model.map(["1+1=", "2+2=", "3+3="], max_workers=2)
+
+        self.assertEqual(len(responses), 3)
+        for response in responses:
+            self.assertEqual(response.raw, self.dummy_generate)
+
+        # the options of a call work without options in the constructor
+        model(prompt="1+1=", options={"temperature": 0.5})
+
+        self.assertDictEqual(
+            mock_client_instance.generate.call_args.kwargs["options"],
+            {"temperature": 0.5},
+        )
+
+        # the reassigned options in the model wrapper take effect
+        model.options = {"temperature": 0.1}
+        model(prompt="1+1=")
+
+        self.assertDictEqual(
+            mock_client_instance.generate.call_args.kwargs["options"],
+            {"temperature": 0.1},
+        )
+
+    @patch("ollama.Client")
+    def test_ollama_shared_client(self, mock_ollama_client: MagicMock) -> None:
+        """Test that the model wrappers targeting the same server share one
+        ollama client."""
+        agentscope.init(
+            model_configs=[
+                {
+                    "config_name": "my_ollama_chat",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                },
+                {
+                    "config_name": "my_ollama_generate",
+                    "model_type": "ollama_generate",
+                    "model_name": "llama2",
+                },
+                {
+                    "config_name": "my_remote_ollama_chat",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                    "host": "http://192.168.0.2:11434",
+                },
+            ],
+            disable_saving=True,
+        )
+
+        manager = ModelManager.get_instance()
+        chat_model = manager.get_model_by_config_name("my_ollama_chat")
+        generate_model = manager.get_model_by_config_name(
+            "my_ollama_generate",
+        )
+        remote_model = manager.get_model_by_config_name(
+            "my_remote_ollama_chat",
+        )
+
+        self.assertIs(chat_model.client, generate_model.client)
+        self.assertIsNotNone(remote_model.client)
+        # One client for the local server and one for the remote server
+        self.assertEqual(mock_ollama_client.call_count, 2)
+
+    @patch("httpx.Client")
+    def test_ollama_client_arguments(
+        self,
+        mock_httpx_client: MagicMock,
+    ) -> None:
+        """Test that the client arguments are passed through to the httpx
+        client, which builds the transport itself so that the verify
+        argument and the proxy environment variables still take effect."""
+        limits = httpx.Limits(max_connections=10)
+        agentscope.init(
+            model_configs=[
+                {
+                    "config_name": "my_ollama_chat",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                    "host": "https://192.168.0.2:11434",
+                    "verify": False,
+                    "limits": limits,
+                },
+                {
+                    "config_name": "my_ollama_chat_transport",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                    "host": "https://192.168.0.3:11434",
+                    "transport": "my_transport",
+                },
+            ],
+            disable_saving=True,
+        )
+        manager = ModelManager.get_instance()
+        manager.get_model_by_config_name("my_ollama_chat")
+
+        kwargs = mock_httpx_client.call_args.kwargs
+        self.assertNotIn("transport", kwargs)
+        self.assertIs(kwargs["verify"], False)
+        self.assertIs(kwargs["limits"], limits)
+        self.assertIn("http2", kwargs)
+
+        # the pool arguments are left out with a user-given transport
+        manager.get_model_by_config_name("my_ollama_chat_transport")
+
+        kwargs = mock_httpx_client.call_args.kwargs
+        self.assertEqual(kwargs["transport"], "my_transport")
+        self.assertNotIn("limits", kwargs)
+        self.assertNotIn("http2", kwargs)
+
+    @patch("agentscope.models.ollama_model.time.perf_counter")
+    @patch("ollama.Client")
+    def test_ollama_multiple_hosts(
+        self,
+        mock_ollama_client: MagicMock,
+        mock_perf_counter: MagicMock,
+    ) -> None:
+        """Test that the requests are routed among multiple hosts by the
+        estimated waiting time."""
+        clients = {
+            "http://192.168.0.2:11434": MagicMock(),
+            "http://192.168.0.3:11434": MagicMock(),
+        }
+        mock_ollama_client.side_effect = lambda host, **_: clients[host]
+        for client in clients.values():
+            client.generate.return_value = self.dummy_generate
+
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_generate",
+                "model_type": "ollama_generate",
+                "model_name": "llama2",
+                "host": list(clients),
+            },
+            disable_saving=True,
+        )
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_generate",
+        )
+        slow, fast = clients.values()
+        self.assertIs(model.client, slow)
+
+        # The start and end time of the first three requests
+        mock_perf_counter.side_effect = [0.0, 2.0, 0.0, 0.5, 0.0, 0.5]
+        for _ in range(3):
+            model("1+1=")
+
+        # The untried host is picked first, and then the faster one
+        self.assertEqual(slow.generate.call_count, 1)
+        self.assertEqual(fast.generate.call_count, 2)
+
+        mock_perf_counter.side_effect = [0.0, 0.0]
+        fast.generate.side_effect = RuntimeError("Server error")
+        with self.assertRaises(RuntimeError):
+            model("1+1=")
+
+        stats = model.balancer.stats
+        self.assertListEqual(
+            [(_["in_flight"], _["finished"], _["failed"]) for _ in stats],
+            [(0, 1, 0), (0, 2, 1)],
+        )
+        self.assertEqual(stats[0]["mean_latency"], 2.0)
+        self.assertEqual(stats[1]["mean_latency"], 0.5)
+
+        # The failed host is skipped during its backoff period, and tried
+        # again afterwards
+        fast.generate.side_effect = None
+        self.assertGreater(stats[1]["retry_after"], 0.0)
+        mock_perf_counter.side_effect = [0.0, 2.0]
+        model("1+1=")
+        self.assertEqual(slow.generate.call_count, 2)
+
+        with patch(
+            "agentscope.models._ollama_utils.time.monotonic",
+            return_value=float("inf"),
+        ):
+            mock_perf_counter.side_effect = [0.0, 0.5]
+            model("1+1=")
+        self.assertEqual(fast.generate.call_count, 4)
+        self.assertEqual(model.balancer.stats[1]["retry_after"], 0.0)
+
+    @patch("ollama.AsyncClient")
+    def test_ollama_multiple_hosts_cancelled(
+        self,
+        mock_ollama_client: MagicMock,
+    ) -> None:
+        """Test that a cancelled request is released without observing its
+        latency, so that a hung host doesn't look fast."""
+
+        async def hang(**_: Any) -> None:
+            await asyncio.sleep(60)
+
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.generate = AsyncMock(side_effect=hang)
+
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_generate",
+                "model_type": "ollama_generate",
+                "model_name": "llama2",
+                "host": ["192.168.0.2", "192.168.0.3"],
+            },
+            disable_saving=True,
+        )
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_generate",
+        )
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(model.agenerate("1+1="), 0.05))
+
+        stats = model.balancer.stats[0]
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["cancelled"], 1)
+        self.assertEqual(stats["finished"], 0)
+        self.assertEqual(stats["failed"], 0)
+        self.assertEqual(stats["mean_latency"], 0.0)
+
+    @patch("agentscope.models.ollama_model.time.perf_counter")
+    @patch("ollama.Client")
+    def test_ollama_multiple_hosts_stream(
+        self,
+        mock_ollama_client: MagicMock,
+        mock_perf_counter: MagicMock,
+    ) -> None:
+        """Test that the latency of a stream request is observed at the
+        first chunk, regardless of how slowly the stream is read."""
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat.return_value = iter(
+            [
+                {"message": {"role": "assistant", "content": content}}
+                for content in ["Hello", "!"]
+            ],
+        )
+
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_chat",
+                "model_type": "ollama_chat",
+                "model_name": "llama2",
+                "host": ["192.168.0.2", "192.168.0.3"],
+                "stream": True,
+            },
+            disable_saving=True,
+        )
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_chat",
+        )
+
+        # The time when the request is routed, sent and the first chunk
+        # is received, where no more time is taken afterwards
+        mock_perf_counter.side_effect = [0.0, 0.0, 0.3]
+        response = model(messages=[{"role": "user", "content": "Hi!"}])
+        stream = response.stream
+        next(stream)
+        self.assertEqual(model.balancer.stats[0]["in_flight"], 1)
+        list(stream)
+
+        stats = model.balancer.stats[0]
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["finished"], 1)
+        self.assertEqual(stats["mean_latency"], 0.3)
+
+    @patch("ollama.AsyncClient")
+    def test_ollama_async(self, mock_ollama_client: MagicMock) -> None:
+        """Unit test for the async methods of ollama model wrappers."""
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat = AsyncMock(
+            return_value=self.dummy_response,
+        )
+        mock_client_instance.embeddings = AsyncMock(
+            return_value=self.dummy_embedding,
+        )
+        mock_client_instance.generate = AsyncMock(
+            return_value=self.dummy_generate,
+        )
+
+        # run test
+        agentscope.init(
+            model_configs=[
+                {
+                    "config_name": "my_ollama_chat",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                    "max_concurrency": 2,
+                },
+                {
+                    "config_name": "my_ollama_embedding",
+                    "model_type": "ollama_embedding",
+                    "model_name": "llama2",
+                },
+                {
+                    "config_name": "my_ollama_generate",
+                    "model_type": "ollama_generate",
+                    "model_name": "llama2",
+                },
+            ],
+            disable_saving=True,
+        )
+
+        manager = ModelManager.get_instance()
+        chat_model = manager.get_model_by_config_name("my_ollama_chat")
+        embedding_model = manager.get_model_by_config_name(
+            "my_ollama_embedding",
+        )
+        generate_model = manager.get_model_by_config_name(
+            "my_ollama_generate",
+        )
+
+        async def run() -> list:
+            return await asyncio.gather(
+                *[
+                    chat_model.achat(
+                        messages=[{"role": "user", "content": "Hi!"}],
+                    )
+                    for _ in range(4)
+                ],
+                embedding_model.aembed(prompt="Hi!"),
+                generate_model.agenerate(prompt="1+1="),
+            )
+
+        responses = asyncio.run(run())
+
+        for response in responses[:4]:
+            self.assertEqual(response.raw, self.dummy_response)
+        self.assertEqual(responses[4].raw, self.dummy_embedding)
+        self.assertEqual(responses[5].raw, self.dummy_generate)
+        self.assertEqual(mock_client_instance.chat.await_count, 4)
+
+    @patch("ollama.AsyncClient")
+    def test_ollama_shared_async_client(
+        self,
+        mock_ollama_client: MagicMock,
+    ) -> None:
+        """Test that the model wrappers targeting the same server share one
+        async client within an event loop, but not across event loops."""
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat = AsyncMock(
+            return_value=self.dummy_response,
+        )
+        mock_client_instance.generate = AsyncMock(
+            return_value=self.dummy_generate,
+        )
+
+        agentscope.init(
+            model_configs=[
+                {
+                    "config_name": "my_ollama_chat",
+                    "model_type": "ollama_chat",
+                    "model_name": "llama2",
+                },
+                {
+                    "config_name": "my_ollama_generate",
+                    "model_type": "ollama_generate",
+                    "model_name": "llama2",
+                },
+            ],
+            disable_saving=True,
+        )
+
+        manager = ModelManager.get_instance()
+        chat_model = manager.get_model_by_config_name("my_ollama_chat")
+        generate_model = manager.get_model_by_config_name(
+            "my_ollama_generate",
+        )
+
+        async def run() -> None:
+            await chat_model.achat(
+                messages=[{"role": "user", "content": "Hi!"}],
+            )
+            await generate_model.agenerate(prompt="1+1=")
+
+        asyncio.run(run())
+        asyncio.run(run())
+
+        # One client for each event loop
+        self.assertEqual(mock_ollama_client.call_count, 2)
+        self.assertEqual(mock_client_instance.chat.await_count, 2)
+
+    def test_ollama_async_multiple_loops(self) -> None:
+        """Test that the async methods work across event loops, e.g. in
+        consecutive `asyncio.run` calls, since the connections of an async
+        client cannot be reused in another event loop."""
+        body = json.dumps(self.dummy_generate).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            """A dummy ollama server that keeps the connections alive."""
+
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # pylint: disable=C0103
+                """Return the dummy generation response."""
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                """Silence the request logs."""
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_generate",
+                "model_type": "ollama_generate",
+                "model_name": "llama2",
+                "host": f"http://127.0.0.1:{server.server_port}",
+            },
+            disable_saving=True,
+        )
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_generate",
+        )
+
+        for _ in range(3):
+            response = asyncio.run(model.agenerate(prompt="1+1="))
+            self.assertEqual(response.text, self.dummy_generate["response"])
+
+    @patch("ollama.AsyncClient")
+    def test_ollama_embedding_abatch(
+        self,
+        mock_ollama_client: MagicMock,
+    ) -> None:
+        """Unit test for embedding prompts by concurrent mini-batches."""
+
+        async def dummy_embed(input: list, **_: Any) -> dict:
+            # pylint: disable=W0622
+            return {"embeddings": [[float(len(_))] for _ in input]}
+
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.embed = AsyncMock(side_effect=dummy_embed)
+
+        # run test
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_embedding",
+                "model_type": "ollama_embedding",
+                "model_name": "llama2",
+            },
+            disable_saving=True,
+        )
+
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_embedding",
+        )
+        prompts = ["a" * i for i in range(1, 8)]
+        response = asyncio.run(
+            model.abatch(prompts, batch_size=3, max_concurrency=2),
+        )
+
+        self.assertListEqual(
+            response.embedding,
+            [[float(i)] for i in range(1, 8)],
+        )
+        self.assertEqual(len(response.raw), 3)
+        self.assertEqual(mock_client_instance.embed.await_count, 3)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(model.abatch(prompts, batch_size=0))
+
+    @patch("ollama.AsyncClient")
+    def test_ollama_achat_stream(self, mock_ollama_client: MagicMock) -> None:
+        """Unit test for ollama async chat API in stream mode."""
+
+        async def dummy_stream() -> AsyncGenerator[dict, None]:
+            for content in ["Hello", "!"]:
+                yield {"message": {"role": "assistant", "content": content}}
+
+        # prepare the mock
+        mock_client_instance = MagicMock()
+        mock_ollama_client.return_value = mock_client_instance
+        mock_client_instance.chat = AsyncMock(return_value=dummy_stream())
+
+        # run test
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_chat",
+                "model_type": "ollama_chat",
+                "model_name": "llama2",
+                "stream": True,
+            },
+            disable_saving=True,
+        )
+
+        model = ModelManager.get_instance().get_model_by_config_name(
+            "my_ollama_chat",
+        )
+
+        async def run(delta: bool) -> tuple:
+            mock_client_instance.chat.return_value = dummy_stream()
+            response = await model.achat(
+                messages=[{"role": "user", "content": "Hi!"}],
+                delta=delta,
+            )
+            return [chunk async for chunk in response.stream], response.text
+
+        chunks, text = asyncio.run(run(delta=False))
+
+        self.assertListEqual(chunks, [(False, "Hello"), (True, "Hello!")])
+        self.assertEqual(text, "Hello!")
+
+        # the full text is joined from the new content in delta mode
+        chunks, text = asyncio.run(run(delta=True))
+
+        self.assertListEqual(chunks, [(False, "Hello"), (True, "!")])
+        self.assertEqual(text, "Hello!")
+
+    def test_ollama_aiohttp_backend(self) -> None:
+        """Unit test for the async methods with the aiohttp backend, which
+        posts requests to a local dummy ollama server."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        bodies = []
+        headers = []
+
+        def add(a: int, b: int) -> int:
+            """Add two numbers.
+
+            Args:
+                a: The first number.
+                b: The second number.
+            """
+            return a + b
+
+        async def chat(request: web.Request) -> web.StreamResponse:
+            body = await request.json()
+            bodies.append(body)
+            headers.append(request.headers.get("Authorization"))
+            if not body["stream"]:
+                return web.json_response(self.dummy_response)
+
+            resp = web.StreamResponse()
+            await resp.prepare(request)
+            for content in ["Hello", "!"]:
+                chunk = {"message": {"role": "assistant", "content": content}}
+                await resp.write(json.dumps(chunk).encode() + b"\n")
+            await resp.write_eof()
+            return resp
+
+        async def embeddings(_: web.Request) -> web.Response:
+            return web.json_response(self.dummy_embedding)
+
+        app = web.Application()
+        app.router.add_post("/api/chat", chat)
+        app.router.add_post("/api/embeddings", embeddings)
+
+        async def run() -> tuple:
+            async with TestServer(app) as server:
+                agentscope.init(
+                    model_configs=[
+                        {
+                            "config_name": "my_ollama_chat",
+                            "model_type": "ollama_chat",
+                            "model_name": "llama2",
+                            "host": f"http://{server.host}:{server.port}",
+                            "use_aiohttp": True,
+                            "headers": {"Authorization": "Bearer xxx"},
+                        },
+                        {
+                            "config_name": "my_ollama_embedding",
+                            "model_type": "ollama_embedding",
+                            "model_name": "llama2",
+                            "host": f"http://{server.host}:{server.port}",
+                            "use_aiohttp": True,
+                        },
+                    ],
+                    disable_saving=True,
+                )
+                manager = ModelManager.get_instance()
+                chat_model = manager.get_model_by_config_name(
+                    "my_ollama_chat",
+                )
+                embedding_model = manager.get_model_by_config_name(
+                    "my_ollama_embedding",
+                )
+
+                chat_response = await chat_model.achat(
+                    messages=[
+                        {"role": "user", "content": "Hi!", "images": [b"a"]},
+                    ],
+                    tools=[add],
+                )
+                embedding_response = await embedding_model.aembed(
+                    prompt="Hi!",
+                )
+                stream_response = await chat_model.achat(
+                    messages=[{"role": "user", "content": "Hi!"}],
+                    stream=True,
+                )
+                chunks = [chunk async for chunk in stream_response.stream]
+
+                # the values that cannot be serialized are not sent
+                with self.assertRaises(TypeError):
+                    await chat_model.achat(
+                        messages=[{"role": "user", "content": "Hi!"}],
+                        options={"seed": object()},
+                    )
+
+                # pylint: disable=W0212
+                session = await chat_model.aiohttp_backend._get_session()
+                await chat_model.aclose()
+                self.assertTrue(session.closed)
+
+                # the sessions are closed when leaving the context
+                async with embedding_model:
+                    session = (
+                        await embedding_model.aiohttp_backend._get_session()
+                    )
+                self.assertTrue(session.closed)
+
+                return chat_response, embedding_response, chunks
+
+        chat_response, embedding_response, chunks = asyncio.run(run())
+
+        # the session left open in a closed event loop is closed in another
+        # event loop
+        backend = (
+            ModelManager.get_instance()
+            .get_model_by_config_name("my_ollama_chat")
+            .aiohttp_backend
+        )
+        loop = asyncio.new_event_loop()
+        # pylint: disable=W0212
+        session = loop.run_until_complete(backend._get_session())
+        loop.close()
+        asyncio.run(backend.close())
+        self.assertTrue(session.closed)
+
+        # the headers are forwarded to the aiohttp session
+        self.assertListEqual(headers, ["Bearer xxx"] * 2)
+
+        # the images and tools are prepared as the ollama client does
+        self.assertListEqual(bodies[0]["messages"][0]["images"], ["YQ=="])
+        self.assertEqual(bodies[0]["tools"][0]["function"]["name"], "add")
+
+        # a clear error is raised if the installed ollama cannot convert the
+        # Python functions into tools
+        with patch.dict(sys.modules, {"ollama._utils": None}):
+            with self.assertRaises(ImportError):
+                # pylint: disable=W0212
+                _AiohttpBackend._prepare_body({"tools": [add]}, stream=False)
+
+        self.assertEqual(
+            chat_response.raw,
+            json.loads(json.dumps(self.dummy_response)),
+        )
+        self.assertEqual(embedding_response.raw, self.dummy_embedding)
+        self.assertListEqual(chunks, [(False, "Hello"), (True, "Hello!")])
+
+    def test_ollama_aiohttp_client_arguments(self) -> None:
+        """Unit test for rejecting the client arguments that are not
+        supported by the aiohttp backend."""
+        agentscope.init(
+            model_configs={
+                "config_name": "my_ollama_unsupported",
+                "model_type": "ollama_chat",
+                "model_name": "llama2",
+                "use_aiohttp": True,
+                "proxy": "http://127.0.0.1:8080",
+            },
+            disable_saving=True,
+        )
+
+        with self.assertRaises(ValueError):
+            ModelManager.get_instance().get_model_by_config_name(
+                "my_ollama_unsupported",
+            )
+
     def tearDown(self) -> None:
         """Clean up after each test."""
         ASManager.get_instance().flush()
+        _get_client.cache_clear()
+        _async_clients.clear()
+        _get_aiohttp_backend.cache_clear()
 
 
 if __name__ == "__main__":